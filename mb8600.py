@@ -1,13 +1,14 @@
 import aiochclient
 import aiohttp
 import asyncio
+import collections
 import colorlog
-import datetime
+import dataclasses
 import hashlib
-import hmac
 import json
 import logging
 import math
+import orjson
 import os
 import re
 import signal
@@ -16,10 +17,164 @@ import time
 
 from time import perf_counter
 
+try:
+    # Use uvloop for the event loop where it's available (not on Windows)
+    import uvloop
+except ImportError:
+    uvloop = None
+
 log = logging.getLogger('mb8600')
 
+# Max number of attempts at inserting a batch into ClickHouse before it's dropped
+CLICKHOUSE_INSERT_ATTEMPTS = 3
+
 UPTIME_REGEX = re.compile(r'(?:(\d+)\s*days\s*)?(?:(\d{2})h:)?(?:(\d{2})m:)?(?:(\d{2})s)?')
 
+def parse_uptime(uptime: str) -> int:
+    """
+        Parses the modem uptime string (e.g. "12 days 04h:33m:10s") into seconds
+    """
+    try:
+        # Fast path for the usual format
+        days, _, hms = uptime.rpartition('days')
+        hours, minutes, seconds = hms.strip().split(':')
+        if not (hours.endswith('h') and minutes.endswith('m') and seconds.endswith('s')):
+            raise ValueError
+        return int(days or 0) * 86400 + int(hours.removesuffix('h')) * 3600 + int(minutes.removesuffix('m')) * 60 + int(seconds.removesuffix('s'))
+    except ValueError:
+        pass
+
+    # Fall back to the regex, any missing field counts as 0
+    match = UPTIME_REGEX.fullmatch(uptime.strip())
+    # Every group is optional, so make sure something actually matched
+    if match is None or not any(match.groups()):
+        raise ValueError(f'Invalid modem uptime: {uptime!r}')
+    days, hours, minutes, seconds = (int(group or 0) for group in match.groups())
+    return days * 86400 + hours * 3600 + minutes * 60 + seconds
+
+def parse_downstream_channel(fields: list) -> list:
+    """
+        Parses a downstream channel record split on "^"
+        (index^lock status^modulation^channel ID^frequency^power^SNR^correcteds^uncorrecteds^)
+    """
+    _, _, modulation, channel_id, frequency, power, snr, correcteds, uncorrecteds, _ = fields
+
+    snr = float(snr)
+    if modulation == 'OFDM PLC':
+        # Check if the OFDM SNR bug is present
+        if snr < 20.0:
+            # We need to correct the SNR value by about 2.5x
+            snr *= 2.5
+
+    # The channel columns are Array(Nested(...)), i.e. Array(Array(Tuple(...))),
+    # so each channel tuple has to be wrapped in its own list
+    return [(
+        int(channel_id),                # Channel ID
+        float(frequency) * 1000000,     # Frequency (converted to MHz)
+        modulation,                     # Modulation
+        float(power),                   # Power (dBmV)
+        snr,                            # SNR (dB)
+        int(correcteds),                # Correcteds
+        int(uncorrecteds),              # Uncorrecteds
+    )]
+
+def parse_modem_response(raw_response: bytes) -> tuple | None:
+    """
+        Parses the raw GetMultipleHNAPs modem response
+
+        Returns None if the request wasn't successful, otherwise a tuple of
+        (config filename, uptime, software version, downstream channels, upstream channels)
+    """
+    # Decode the response
+    modem_response = orjson.loads(raw_response)['GetMultipleHNAPsResponse']
+    # Check if the response was successful
+    if modem_response['GetMultipleHNAPsResult'] != 'OK':
+        return None
+
+    # Downstream channels
+    downstream_channels = [
+        parse_downstream_channel(channel.split('^'))
+        for channel in modem_response['GetMotoStatusDownstreamChannelInfoResponse']['MotoConnDownstreamChannel'].split('|+|')
+    ]
+
+    # Upstream channels
+    # (each channel tuple is wrapped in a list, see parse_downstream_channel)
+    upstream_channels = [
+        [(
+            int(channel_id),                # Channel ID
+            float(frequency) * 1000000,     # Frequency (converted to MHz)
+            modulation,                     # Modulation
+            float(power),                   # Power (dBmV)
+            float(width) * 1000,            # Width (converted to MHz)
+        )]
+        for _, _, modulation, channel_id, width, frequency, power, _ in (
+            channel.split('^')
+            for channel in modem_response['GetMotoStatusUpstreamChannelInfoResponse']['MotoConnUpstreamChannel'].split('|+|')
+        )
+    ]
+
+    # Parse device uptime
+    uptime = parse_uptime(modem_response['GetMotoStatusConnectionInfoResponse']['MotoConnSystemUpTime'])
+
+    return (
+        modem_response['GetMotoStatusStartupSequenceResponse']['MotoConnConfigurationFileComment'], # Modem DOCSIS configuration filename
+        uptime,                                                                                     # Modem uptime
+        modem_response['GetMotoStatusSoftwareResponse']['StatusSoftwareSfVer'],                     # Modem software version
+        downstream_channels,                                                                        # Downstream channels
+        upstream_channels,                                                                          # Upstream channels
+    )
+
+# HMAC inner/outer pad translation tables
+HMAC_IPAD = bytes(x ^ 0x36 for x in range(256))
+HMAC_OPAD = bytes(x ^ 0x5C for x in range(256))
+
+def prepare_hmac_md5(key: bytes) -> tuple:
+    """
+        Precomputes the inner and outer MD5 states of an HMAC-MD5 key
+        so they can be copied instead of rehashing the key pads every time
+    """
+    # Keys longer than the MD5 block size are hashed first
+    if len(key) > 64:
+        key = hashlib.md5(key, usedforsecurity=False).digest()
+    key = key.ljust(64, b'\0')
+    return (
+        hashlib.md5(key.translate(HMAC_IPAD), usedforsecurity=False),
+        hashlib.md5(key.translate(HMAC_OPAD), usedforsecurity=False)
+    )
+
+def hmac_md5(hmac_states: tuple, msg: bytes) -> str:
+    """
+        Generates an uppercase hex HMAC-MD5 from precomputed key states
+    """
+    inner = hmac_states[0].copy()
+    inner.update(msg)
+    outer = hmac_states[1].copy()
+    outer.update(inner.digest())
+    return outer.hexdigest().upper()
+
+# Pre-encoded SOAP action URIs used when generating the HNAP auth header
+SOAP_ACTION_URIS = {
+    soap_action: f'http://purenetworks.com/HNAP1/{soap_action}'.encode()
+    for soap_action in ('Login', 'GetMultipleHNAPs')
+}
+
+# HMAC-MD5 key states used for the HNAP auth header before logging in
+INITIAL_HNAP_HMAC = prepare_hmac_md5(b'withoutloginkey')
+
+@dataclasses.dataclass(slots=True)
+class HnapSession:
+    """
+        Data needed for HNAP authentication, generated during the login process
+    """
+    challenge: str
+    uid: str
+    public_key: str
+    private_key: str
+    login_password: str
+    hnap_auth: str
+    # Precomputed private key HMAC-MD5 states (see prepare_hmac_md5)
+    private_key_hmac: tuple
+
 class MB8600:
     def __init__(self, loop):
         # Setup logging
@@ -30,18 +185,22 @@ class MB8600:
         # Event loop
         self.loop = loop
 
+        # ClickHouse INSERT query, the table name doesn't change so build it once
+        self.clickhouse_insert_query = f'INSERT INTO {self.clickhouse_table} (modem_name, modem_config_filename, modem_uptime, modem_version, modem_model, downstream_channels, upstream_channels, scrape_latency, timestamp)'
+        if self.clickhouse_async_insert:
+            # Let the ClickHouse server batch our inserts with other clients' inserts
+            self.clickhouse_insert_query += ' SETTINGS async_insert=1, wait_for_async_insert=0'
+        self.clickhouse_insert_query += ' VALUES'
+
         # Queue of data waiting to be inserted into ClickHouse
-        self.clickhouse_queue = asyncio.Queue(maxsize=self.clickhouse_queue_limit)
+        # Once the limit is reached data is dropped according to the drop policy
+        self.clickhouse_queue = collections.deque(maxlen=self.clickhouse_queue_limit)
+        # Event set whenever there's data in the ClickHouse queue
+        self.clickhouse_queue_event = asyncio.Event()
 
         # Data needed for HNAP authentication
         # Generated during the login process
-        self.modem_hnap_session = {
-            'challenge': None,
-            'uid': None,
-            'public_key': None,
-            'private_key': None,
-            'login_password': None
-        }
+        self.modem_hnap_session: HnapSession | None = None
 
         # Event used to stop the loop
         self.stop_event = asyncio.Event()
@@ -124,6 +283,29 @@ class MB8600:
             log.critical('Invalid CLICKHOUSE_QUEUE_LIMIT, must be a valid number >= 25')
             exit(1)
 
+        # ClickHouse async inserts (bool, default: 0)
+        self.clickhouse_async_insert = os.environ.get('CLICKHOUSE_ASYNC_INSERT', '0')
+        if self.clickhouse_async_insert not in ('0', '1'):
+            log.critical('Invalid CLICKHOUSE_ASYNC_INSERT, must be either 0 or 1')
+            exit(1)
+        self.clickhouse_async_insert = self.clickhouse_async_insert == '1'
+
+        # ClickHouse queue drop policy (str, default: "oldest")
+        self.clickhouse_drop_policy = os.environ.get('CLICKHOUSE_DROP_POLICY', 'oldest').lower()
+        if self.clickhouse_drop_policy not in ('oldest', 'newest'):
+            log.critical('Invalid CLICKHOUSE_DROP_POLICY, must be either oldest or newest')
+            exit(1)
+
+        # ClickHouse batch size (int, default: 32)
+        try:
+            self.clickhouse_batch_size = int(os.environ.get('CLICKHOUSE_BATCH_SIZE', 32))
+            # Make sure the batch size is at least 1
+            if self.clickhouse_batch_size < 1:
+                raise ValueError
+        except ValueError:
+            log.critical('Invalid CLICKHOUSE_BATCH_SIZE, must be a valid number >= 1')
+            exit(1)
+
         try:
             log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
             if log_level not in ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'):
@@ -140,13 +322,12 @@ class MB8600:
             Generates the private key used for HNAP authentication
         """
         # Generate the private key
-        private_key = hmac.new(
-            f'{public_key}{self.modem_password}'.encode(),
-            challenge.encode(),
-            hashlib.md5
-        ).hexdigest().upper()
+        private_key = hmac_md5(
+            prepare_hmac_md5(f'{public_key}{self.modem_password}'.encode()),
+            challenge.encode()
+        )
 
-        log.debug(f'Generated private key: {private_key}')
+        log.debug('Generated private key: %s', private_key)
 
         return private_key
     
@@ -155,17 +336,16 @@ class MB8600:
             Generates the login password used for HNAP authentication
         """
         # Generate the login password
-        login_password = hmac.new(
-            private_key.encode(),
-            challenge.encode(),
-            hashlib.md5
-        ).hexdigest().upper()
+        login_password = hmac_md5(
+            prepare_hmac_md5(private_key.encode()),
+            challenge.encode()
+        )
 
-        log.debug(f'Generated login password: {login_password}')
+        log.debug('Generated login password: %s', login_password)
 
         return login_password
 
-    def generate_hnap_auth(self, soap_action: str, private_key: str="withoutloginkey") -> str:
+    def generate_hnap_auth(self, soap_action: str, hnap_hmac: tuple=INITIAL_HNAP_HMAC) -> str:
         """
             Generates the HNAP AUTH header
         """
@@ -173,17 +353,11 @@ class MB8600:
         current_time = int(time.time() * 1000)
         current_time = math.floor(current_time) % 2000000000000
 
-        soap_action_uri = f'http://purenetworks.com/HNAP1/{soap_action}'
-
         # Generate the MD5 HMAC and uppercase it
-        auth = hmac.new(
-            private_key.encode(),
-            f'{current_time}{soap_action_uri}'.encode(),
-            hashlib.md5
-        ).hexdigest().upper()
+        auth = hmac_md5(hnap_hmac, b'%d' % current_time + SOAP_ACTION_URIS[soap_action])
         # Combine the auth string with the time (again, for some reason)
         auth = f'{auth} {current_time}'
-        log.debug(f'Generated Hnap_auth: {auth}')
+        log.debug('Generated Hnap_auth: %s', auth)
         return auth
     
     async def login(self):
@@ -210,9 +384,11 @@ class MB8600:
                 }
             }
         ) as resp:
-            log.debug(f'Got login request response HTTP {resp.status} {resp.reason}: {await resp.text()}')
+            # Only read the response text when it's actually going to be logged
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Got login request response HTTP %s %s: %s', resp.status, resp.reason, await resp.text())
             # Decode the respnse (JSON returned with html content type, why???)
-            login_response = await resp.json(content_type='text/html')
+            login_response = await resp.json(content_type='text/html', loads=orjson.loads)
 
         challenge = login_response['LoginResponse']['Challenge']
         cookie = login_response['LoginResponse']['Cookie']
@@ -221,16 +397,21 @@ class MB8600:
         private_key = self.generate_private_key(public_key, challenge)
         # Generate the login password
         login_password = self.generate_login_password(private_key, challenge)
+        # Precompute the private key HMAC state since it's reused for every HNAP_AUTH header
+        private_key_hmac = prepare_hmac_md5(private_key.encode())
         # Generate the HNAP_AUTH header
-        hnap_auth = self.generate_hnap_auth(soap_action, private_key)
+        hnap_auth = self.generate_hnap_auth(soap_action, private_key_hmac)
 
         # Store the session data
-        self.modem_hnap_session['challenge'] = challenge
-        self.modem_hnap_session['uid'] = cookie
-        self.modem_hnap_session['public_key'] = public_key
-        self.modem_hnap_session['private_key'] = private_key
-        self.modem_hnap_session['login_password'] = login_password
-        self.modem_hnap_session['hnap_auth'] = hnap_auth
+        self.modem_hnap_session = HnapSession(
+            challenge=challenge,
+            uid=cookie,
+            public_key=public_key,
+            private_key=private_key,
+            login_password=login_password,
+            hnap_auth=hnap_auth,
+            private_key_hmac=private_key_hmac
+        )
 
         # Login with the generated login password and HNAP variables
         async with self.session.post(
@@ -251,8 +432,8 @@ class MB8600:
             }
         ) as resp:
             # Decode the respnse (JSON returned with html content type, why???)
-            login_response = await resp.json(content_type='text/html')
-            log.debug(f'Got login response HTTP {resp.status} {resp.reason}: {login_response}')
+            login_response = await resp.json(content_type='text/html', loads=orjson.loads)
+            log.debug('Got login response HTTP %s %s: %s', resp.status, resp.reason, login_response)
             if login_response['LoginResponse']['LoginResult'] != 'OK':
                 raise Exception('Invalid username or password')
             else:
@@ -261,7 +442,18 @@ class MB8600:
     async def run(self):
         # Create a ClientSession that doesn't verify SSL certificates
         self.session = aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(ssl=False)
+            connector=aiohttp.TCPConnector(
+                ssl=False,
+                # We only ever talk to the modem and ClickHouse, one request at a time each
+                limit=4,
+                limit_per_host=2,
+                # Keep connections alive between scrapes
+                keepalive_timeout=max(60, self.scrape_delay * 3),
+                ttl_dns_cache=600
+            ),
+            timeout=aiohttp.ClientTimeout(total=30),
+            # Use orjson for encoding request bodies
+            json_serialize=lambda obj: orjson.dumps(obj).decode()
         )
         self.clickhouse = aiochclient.ChClient(
             self.session,
@@ -295,20 +487,65 @@ class MB8600:
         """
             Insert queue'd data into ClickHouse
         """
+        # Data waiting to be inserted, kept across retries
+        batch = []
+        # Data from a rejected batch, retried one at a time so one bad row doesn't drop the rest
+        single_retries = collections.deque()
+        # Number of times ClickHouse rejected the current batch
+        failed_attempts = 0
         while True:
             try:
-                # Get the data from the queue
-                data = await self.clickhouse_queue.get()
-                log.debug(f'Inserting data into ClickHouse: {data}')
+                # Start a new batch if there's nothing left over from a failed insert
+                if not batch:
+                    if single_retries:
+                        batch.append(single_retries.popleft())
+                    else:
+                        await self.clickhouse_queue_event.wait()
+                        # Batch the data that's waiting in the queue
+                        while len(batch) < self.clickhouse_batch_size and self.clickhouse_queue:
+                            batch.append(self.clickhouse_queue.popleft())
+                        if not self.clickhouse_queue:
+                            self.clickhouse_queue_event.clear()
+                        if not batch:
+                            continue
+
+                # All queue'd data shares the same INSERT query
+                rows = [row for _, data_rows in batch for row in data_rows]
+                log.debug('Inserting %s row(s) into ClickHouse: %s', len(rows), rows)
                 # Insert the data into ClickHouse
                 await self.clickhouse.execute(
-                    data[0],
-                    *data[1]
+                    batch[0][0],
+                    *rows
                 )
-            except Exception as e:
+                batch.clear()
+                failed_attempts = 0
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # ClickHouse is unreachable, keep the batch and retry until it's back
+                # (the queue keeps buffering new data in the meantime)
+                log.error(f'Failed to connect to ClickHouse: {e}')
+                await asyncio.sleep(5)
+            except aiochclient.ChClientError as e:
+                # ClickHouse rejected the data
                 log.error(f'Failed to insert data into ClickHouse: {e}')
+                failed_attempts += 1
+                if failed_attempts >= CLICKHOUSE_INSERT_ATTEMPTS:
+                    failed_attempts = 0
+                    if len(batch) > 1:
+                        # Find the bad data by retrying the batch one at a time
+                        log.warning(f'Retrying {len(batch)} queue\'d data one at a time')
+                        single_retries.extend(batch)
+                    else:
+                        # Give up on the data so it can't stall all inserts
+                        log.error(f'Dropping queue\'d data after {CLICKHOUSE_INSERT_ATTEMPTS} failed insert attempts: {batch[0][1]}')
+                    batch.clear()
+                    continue
                 # Wait before we retry inserting
                 await asyncio.sleep(5)
+            except Exception as e:
+                # Anything else is unexpected, drop the batch instead of retrying it forever
+                log.error(f'Failed to insert data into ClickHouse, dropping {len(batch)} queue\'d data: {e}')
+                batch.clear()
+                failed_attempts = 0
 
     async def export(self):
         try:
@@ -320,9 +557,11 @@ class MB8600:
             return
 
         modem_hnap_url = f'{self.modem_url}/HNAP1/'
-        modem_cookies = {'uid': self.modem_hnap_session['uid'], 'PrivateKey': self.modem_hnap_session['private_key']}
+        # Bind the session data once, it only changes when logging in again
+        private_key_hmac = self.modem_hnap_session.private_key_hmac
+        modem_cookies = {'uid': self.modem_hnap_session.uid, 'PrivateKey': self.modem_hnap_session.private_key}
         modem_headers = {
-            'Hnap_auth': self.modem_hnap_session['hnap_auth'],
+            'Hnap_auth': self.modem_hnap_session.hnap_auth,
             'Soapaction': 'http://purenetworks.com/HNAP1/GetMultipleHNAPs',
         }
 
@@ -331,7 +570,7 @@ class MB8600:
                 start = perf_counter()
 
                 # Update the Hnap_auth header since it's timestamp based
-                modem_headers['Hnap_auth'] = self.generate_hnap_auth('GetMultipleHNAPs', self.modem_hnap_session['private_key'])
+                modem_headers['Hnap_auth'] = self.generate_hnap_auth('GetMultipleHNAPs', private_key_hmac)
                 # Login with the generated login password and HNAP variables
                 async with self.session.post(
                     modem_hnap_url,
@@ -347,102 +586,61 @@ class MB8600:
                         }
                     }
                 ) as resp:
-                    # Decode the respnse (JSON returned with html content type, why???)
-                    modem_response = await resp.json(content_type='text/html')
-                    log.debug(f'Got modem status response HTTP {resp.status} {resp.reason}: {modem_response}')
-                    # Check if the response was successful
-                    if modem_response['GetMultipleHNAPsResponse']['GetMultipleHNAPsResult'] != 'OK':
-                        # Session most likely expired, try to login again
-                        log.warning('Session expired, trying to login again')
-                        await self.login()
-                        # Wait before we retry scraping
-                        await asyncio.sleep(self.scrape_delay)
-                        continue
+                    # Read the raw response (JSON returned with html content type, why???)
+                    raw_response = await resp.read()
+                    # Only decode the response text when it's actually going to be logged
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug('Got modem status response HTTP %s %s: %s', resp.status, resp.reason, raw_response.decode(errors='replace'))
 
                 scraping_latency = perf_counter() - start
-                log.info(f'Modem status scraping complete, took {round(scraping_latency, 2)}s')
+
+                # Decode and parse the response in a worker thread to keep the event loop free
+                modem_status = await self.loop.run_in_executor(None, parse_modem_response, raw_response)
+                if modem_status is None:
+                    # Session most likely expired, try to login again
+                    log.warning('Session expired, trying to login again')
+                    await self.login()
+                    # Update the session data from the new login
+                    private_key_hmac = self.modem_hnap_session.private_key_hmac
+                    modem_cookies = {'uid': self.modem_hnap_session.uid, 'PrivateKey': self.modem_hnap_session.private_key}
+                    # Retry scraping after the scrape delay
+                    continue
+                config_filename, uptime, version, downstream_channels, upstream_channels = modem_status
+                log.info('Modem status scraping complete, took %.2fs', scraping_latency)
 
                 # Get the current UTC timestamp
-                timestamp = datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
-
-                # Downstream channels
-                downstream_channels = []
-                for channel in modem_response['GetMultipleHNAPsResponse']['GetMotoStatusDownstreamChannelInfoResponse']['MotoConnDownstreamChannel'].split('|+|'):
-                    _, _, modulation, channel_id, frequency, power, snr, correcteds, uncorrecteds, _ = channel.split('^')
-                    if (modulation == 'OFDM PLC'):
-                        # Check if the OFDM SNR bug is present
-                        if (snr := float(snr)) < 20.0:
-                            # We need to correct the SNR value by about 2.5x
-                            snr *= 2.5
-                    
-                    downstream_channels.append([(
-                        int(channel_id),                # Channel ID
-                        float(frequency) * 1000000,     # Frequency (converted to MHz)
-                        modulation,                     # Modulation
-                        float(power),                   # Power (dBmV)
-                        float(snr),                     # SNR (dB)
-                        int(correcteds),                # Correcteds
-                        int(uncorrecteds),              # Uncorrecteds
-                    )])
-
-                # Upstream channels
-                upstream_channels = []
-                for channel in modem_response['GetMultipleHNAPsResponse']['GetMotoStatusUpstreamChannelInfoResponse']['MotoConnUpstreamChannel'].split('|+|'):
-                    _, _, modulation, channel_id, width, frequency, power, _ = channel.split('^')
-                    upstream_channels.append([(
-                        int(channel_id),                # Channel ID
-                        float(frequency) * 1000000,     # Frequency (converted to MHz)
-                        modulation,                     # Modulation
-                        float(power),                   # Power (dBmV)
-                        float(width) * 1000,            # Width (converted to MHz)
-                    )])
-
-                # Parse device uptime
-                uptime = 0
-                uptime_groups = UPTIME_REGEX.search(modem_response['GetMultipleHNAPsResponse']['GetMotoStatusConnectionInfoResponse']['MotoConnSystemUpTime']).groups()
-                # Days
-                uptime += int(uptime_groups[0]) * 86400
-                # Hours
-                uptime += int(uptime_groups[1]) * 3600
-                # Minutes
-                uptime += int(uptime_groups[2]) * 60
-                # Seconds
-                uptime += int(uptime_groups[3])
-
-                ok = [(
-                        self.modem_name,                                                                                                        # Modem name
-                        modem_response['GetMultipleHNAPsResponse']['GetMotoStatusStartupSequenceResponse']['MotoConnConfigurationFileComment'], # Modem DOCSIS configuration filename
-                        uptime,                                                                                                                 # Modem uptime
-                        modem_response['GetMultipleHNAPsResponse']['GetMotoStatusSoftwareResponse']['StatusSoftwareSfVer'],                     # Modem software version
-                        'MB8600',                                                                                                               # Modem model
-                        downstream_channels,                                                                                                    # Downstream channels
-                        upstream_channels,                                                                                                      # Upstream channels
-                        scraping_latency,                                                                                                       # Scraping latency
-                        timestamp                                                                                                               # Data timestamp
-                    )]
+                timestamp = time.time()
+
+                # Check if ClickHouse inserts are falling behind
+                if len(self.clickhouse_queue) >= self.clickhouse_queue_limit:
+                    log.warning(f'ClickHouse queue is full, dropping {self.clickhouse_drop_policy} data')
+                    if self.clickhouse_drop_policy == 'newest':
+                        continue
 
                 # Insert data into ClickHouse
-                await self.clickhouse_queue.put((
-                    f"INSERT INTO {self.clickhouse_table} (modem_name, modem_config_filename, modem_uptime, modem_version, modem_model, downstream_channels, upstream_channels, scrape_latency, timestamp) VALUES",
+                # (the deque drops the oldest data itself when it's full)
+                self.clickhouse_queue.append((
+                    self.clickhouse_insert_query,
                     [(
-                        self.modem_name,                                                                                                        # Modem name
-                        modem_response['GetMultipleHNAPsResponse']['GetMotoStatusStartupSequenceResponse']['MotoConnConfigurationFileComment'], # Modem DOCSIS configuration filename
-                        uptime,                                                                                                                 # Modem uptime
-                        modem_response['GetMultipleHNAPsResponse']['GetMotoStatusSoftwareResponse']['StatusSoftwareSfVer'],                     # Modem software version
-                        'MB8600',                                                                                                               # Modem model
-                        downstream_channels,                                                                                                    # Downstream channels
-                        upstream_channels,                                                                                                      # Upstream channels
-                        scraping_latency,                                                                                                       # Scraping latency
-                        timestamp                                                                                                               # Data timestamp
+                        self.modem_name,                                                                            # Modem name
+                        config_filename,                                                                            # Modem DOCSIS configuration filename
+                        uptime,                                                                                     # Modem uptime
+                        version,                                                                                    # Modem software version
+                        'MB8600',                                                                                   # Modem model
+                        downstream_channels,                                                                        # Downstream channels
+                        upstream_channels,                                                                          # Upstream channels
+                        scraping_latency,                                                                           # Scraping latency
+                        timestamp                                                                                   # Data timestamp
                     )]
                 ))
+                self.clickhouse_queue_event.set()
             except Exception as e:
                 log.error(f'Failed to update modem status: {e}')
-                await asyncio.sleep(self.scrape_delay)
             finally:
+                # Wait before the next scrape (also covers retries after errors)
                 await asyncio.sleep(self.scrape_delay)
 
-loop = asyncio.new_event_loop()
+loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
 exporter = MB8600(loop)
 
 def sigterm_handler(_signo, _stack_frame):